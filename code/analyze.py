@@ -0,0 +1,152 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from boardclasses import *
+from search import search_best_move, MAX_DEPTH
+from timemanager import TimeManager
+
+
+# Default limits per position, used when a position does not specify its own.
+# With a time limit and no depth, the search goes up to MAX_DEPTH and the time decides.
+DEFAULT_DEPTH = 3
+DEFAULT_TIME = None
+
+# A progress line is written to stderr every this many positions
+PROGRESS_INTERVAL = 10
+
+
+def build_board_state(moves, geometry):
+	boardState = BoardState([], [], None, 1, PLAYER_1, geometry=geometry)
+
+	for move in moves:
+		if boardState.terminal_node:
+			raise ValueError("Moves after the end of the game: '{}'".format(move))
+
+		try:
+			converted_string = geometry.havannah_to_my_notation_dict[move.upper()]
+		except KeyError:
+			raise ValueError("Incorrect move notation: '{}'".format(move))
+
+		(input_row_string, input_column_string) = converted_string.split(" ")
+		was_move_made, boardState = boardState.make_move(int(input_row_string), int(input_column_string))
+		if not was_move_made:
+			raise ValueError("Illegal move: '{}'".format(move))
+
+	return boardState
+
+
+def init_worker():
+	# The engine reports its progress with print, which would mix with the results
+	sys.stdout = open(os.devnull, 'w')
+
+
+def analyze_position(job):
+	index, line, default_depth, default_time, default_side = job
+	start_time = time.time()
+	position = None
+
+	try:
+		position = json.loads(line)
+		if not isinstance(position, dict):
+			raise ValueError("A position must be a JSON object")
+
+		side = position.get("side", default_side)
+		if not isinstance(side, int) or side < MIN_BOARD_SIDE or side > MAX_BOARD_SIDE:
+			raise ValueError("The board side must be an integer from {} to {}".format(MIN_BOARD_SIDE, MAX_BOARD_SIDE))
+
+		geometry = get_board_geometry(side)
+		boardState = build_board_state(position["moves"], geometry)
+		if boardState.terminal_node:
+			raise ValueError("The game is already finished")
+		if len(boardState.valid_moves) == 0:
+			raise ValueError("No legal moves")
+
+		move_time = position.get("time", default_time)
+		max_depth = position.get("depth", default_depth)
+		if max_depth is None:
+			max_depth = MAX_DEPTH if move_time is not None else DEFAULT_DEPTH
+		time_manager = TimeManager(move_time, 0, move_time) if move_time is not None else None
+
+		best_move, score, depth = search_best_move(boardState, time_manager, max_depth)
+
+		result = {
+			"best_move": geometry.my_notation_to_havannah_dict[str(best_move[0]) + ' ' + str(best_move[1])],
+			"score": score,
+			"depth": depth,
+		}
+	except (ValueError, KeyError, TypeError) as error:
+		result = {"error": "{}: {}".format(type(error).__name__, error)}
+
+	if isinstance(position, dict) and "id" in position:
+		result = dict({"id": position["id"]}, **result)
+	result["index"] = index
+	result["time"] = round(time.time() - start_time, 3)
+
+	return result
+
+
+def read_jobs(input_file, default_depth, default_time, default_side):
+	index = 0
+	for line in input_file:
+		if line.strip() == "":
+			continue
+		yield (index, line, default_depth, default_time, default_side)
+		index += 1
+
+
+def report_progress(analyzed_count, errors_count, start_time):
+	elapsed = time.time() - start_time
+	throughput = analyzed_count / elapsed if elapsed > 0 else 0
+	print("Analyzed {} positions ({} errors) in {:.1f}s, {:.2f} positions/s".format(analyzed_count, errors_count, elapsed, throughput), file=sys.stderr)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Analyze Andantino positions given as JSON lines, e.g. {\"id\": 1, \"moves\": [\"10 J\", \"10 K\"]}")
+	parser.add_argument("input", nargs="?", default="-", help="file with one position per line ('-' for stdin)")
+	parser.add_argument("-o", "--output", default="-", help="file for the results ('-' for stdout)")
+	parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="number of engine processes")
+	parser.add_argument("-d", "--depth", type=int, default=None, help="maximum search depth per position (default {}, or unlimited with a time limit)".format(DEFAULT_DEPTH))
+	parser.add_argument("-t", "--time", type=float, default=DEFAULT_TIME, help="time limit per position (seconds)")
+	parser.add_argument("-s", "--side", type=int, default=DEFAULT_BOARD_SIDE, help="board side length (positions can give their own \"side\")")
+	parser.add_argument("--unordered", action="store_true", help="write the results as they complete instead of in the input order")
+	args = parser.parse_args()
+
+	input_file = sys.stdin if args.input == "-" else open(args.input)
+	output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+
+	jobs = read_jobs(input_file, args.depth, args.time, args.side)
+
+	analyzed_count = 0
+	errors_count = 0
+	start_time = time.time()
+
+	with multiprocessing.Pool(args.workers, initializer=init_worker) as pool:
+		if args.unordered:
+			results = pool.imap_unordered(analyze_position, jobs)
+		else:
+			results = pool.imap(analyze_position, jobs)
+
+		for result in results:
+			output_file.write(json.dumps(result) + "\n")
+			output_file.flush()
+
+			analyzed_count += 1
+			if "error" in result:
+				errors_count += 1
+			if analyzed_count % PROGRESS_INTERVAL == 0:
+				report_progress(analyzed_count, errors_count, start_time)
+
+	report_progress(analyzed_count, errors_count, start_time)
+
+	if input_file is not sys.stdin:
+		input_file.close()
+	if output_file is not sys.stdout:
+		output_file.close()
+
+
+if __name__ == "__main__":
+	main()
@@ -1,8 +1,15 @@
 import math
+import random
+from collections import Counter
+from functools import cached_property
 
 
-CENTRAL_HEXAGON_ROW = 9
-CENTRAL_HEXAGON_COLUMN = 9
+# Number of hexagons along each side of the board (10 -> 19 rows, 271 hexagons)
+DEFAULT_BOARD_SIDE = 10
+
+# Board sides accepted from the outside (server, batch analysis); the geometry of a side is generated once and kept in memory
+MIN_BOARD_SIDE = 3
+MAX_BOARD_SIDE = 20
 HEX_SIDE = 20
 CIRCLE_RADIUS = 10
 
@@ -16,6 +23,19 @@ DIRECTION_UPPER_RIGHT = 4
 DIRECTION_BOTTOM_LEFT = 5
 DIRECTION_BOTTOM_RIGHT = 6
 
+ALL_DIRECTIONS = [DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_UPPER_LEFT, DIRECTION_UPPER_RIGHT, DIRECTION_BOTTOM_LEFT, DIRECTION_BOTTOM_RIGHT]
+
+ZOBRIST_SEED = 2020
+
+# Pattern evaluation (evaluate_patterns): scores from the point of view of player 1.
+# A segment is 5 consecutive hexagons along one of the three axes, it only counts if it holds the stones of a single player.
+SEGMENT_SCORES = [0, 1, 3, 9, 27, 1000] # by the number of stones of the player in the segment
+# A ring is a stone together with its 6 neighbours, it scores when the stone gets surrounded by the opponent
+RING_SCORES = [0, 0, 0, 1, 3, 9, 1000] # by the number of opponent neighbours (stone away from the border)
+
+SEGMENT_LENGTH = 5
+OFF_BOARD = 3 # cell value of a missing ring neighbour (cells: 0 empty, 1 player 1, 2 player 2)
+
 
 class Hexagon:
 	def __init__(self, row, column, x, y):
@@ -28,128 +48,367 @@ class Hexagon:
 		return "{}\t{}\t{}\t{}".format(self.row, self.column, self.x, self.y)
 
 
-def create_all_hexagons():
+def determine_next_hex_coordinates(current_row, current_column, direction):
+	if direction == DIRECTION_LEFT:
+		return (current_row, current_column - 1)
+
+	if direction == DIRECTION_RIGHT:
+		return (current_row, current_column + 1)
+
+	if direction == DIRECTION_UPPER_LEFT:
+		if current_row %2 == 0:
+			current_column -= 1
+		return (current_row - 1, current_column)
+
+	if direction == DIRECTION_UPPER_RIGHT:
+		if current_row %2 != 0:
+			current_column += 1
+		return (current_row - 1, current_column)
+
+	if direction == DIRECTION_BOTTOM_LEFT:
+		if current_row %2 == 0:
+			current_column -= 1
+		return (current_row + 1, current_column)
+
+	if direction == DIRECTION_BOTTOM_RIGHT:
+		if current_row %2 != 0:
+			current_column += 1
+		return (current_row + 1, current_column)
+
+	return (current_row, current_column)
+
+
+def get_valid_column_ranges(side):
+	# Rows are offset: odd rows are shifted right by half a hexagon with respect to the even ones
+	central_row = side - 1
+	last_column = 2 * side - 2
+
+	column_ranges = []
+	for row in range(2 * side - 1):
+		distance = abs(row - central_row)
+		if central_row % 2 != 0:
+			column_ranges.append((math.ceil(distance / 2), last_column - distance // 2))
+		else:
+			column_ranges.append((distance // 2, last_column - math.ceil(distance / 2)))
+
+	return column_ranges
+
+
+def create_all_hexagons(side):
 	start_x = 50
 	start_y = 50
+	size = 2 * side - 1
 
 	all_hexagons = []
 
-	for row in range(0, 19, 2):
-		for column in range(19):
+	for row in range(0, size, 2):
+		for column in range(size):
 			all_hexagons.append(Hexagon(row, column, start_x + column * HEX_SIDE * math.sqrt(3), start_y + row * 3 / 2 * HEX_SIDE))
 
 	offset = HEX_SIDE * math.sqrt(3) / 2
 
-	for row in range(1, 19, 2):
-		for column in range(19):
+	for row in range(1, size, 2):
+		for column in range(size):
 			all_hexagons.append(Hexagon(row, column, start_x + offset + column * HEX_SIDE * math.sqrt(3), start_y + row * 3 / 2 * HEX_SIDE))
 
 	return all_hexagons
 
 
-def get_valid_hexagons():
-	all_hexagons = create_all_hexagons()
-	valid_column_ranges_per_row = [(5,14), (4,14), (4,15), (3,15), (3,16), (2,16), (2,17), (1,17), (1,18), (0,18), 
-								   (1,18), (1,17), (2,17), (2,16), (3,16), (3,15), (4,15), (4,14), (5,14)]
+def get_valid_hexagons(side):
+	all_hexagons = create_all_hexagons(side)
+	valid_column_ranges_per_row = get_valid_column_ranges(side)
 	valid_hexagons = []
 	for hex in all_hexagons:
 		hex_row = hex.row
 		hex_column = hex.column
 		if hex_column >= valid_column_ranges_per_row[hex_row][0] and \
 		   hex_column <= valid_column_ranges_per_row[hex_row][1]:
-			valid_hexagons.append(hex)	
+			valid_hexagons.append(hex)
 
 	return valid_hexagons
 
 
+def generate_zobrist_keys(hexagons, side):
+	# Fixed seed, so that the hashes are the same in every run (and every process).
+	# Different for every side: the caches and tables of the search are shared by the positions on all board sizes.
+	generator = random.Random(ZOBRIST_SEED * 1000 + side)
+
+	# Hash of the empty board, so that the positions with the same stones on two boards differ as well
+	board_key = generator.getrandbits(64)
+
+	# hexagon -> (key of a player 1 stone, key of a player 2 stone, key of the last move marker)
+	zobrist_keys = {}
+	for hex in sorted(hexagons, key=lambda hex: (hex.row, hex.column)):
+		zobrist_keys[hex] = (generator.getrandbits(64), generator.getrandbits(64), generator.getrandbits(64))
+
+	return board_key, zobrist_keys
+
+
+def get_column_label(index):
+	# A, B, ..., Z, AA, AB, ... (boards with more than 26 columns)
+	label = ""
+	index += 1
+	while index > 0:
+		index, remainder = divmod(index - 1, 26)
+		label = chr(ord('A') + remainder) + label
+
+	return label
+
+
+def generate_conversion_dictionaries(side=DEFAULT_BOARD_SIDE):
+	# Havannah notation: rows numbered from 1 (top), hexagons of a row lettered from the left,
+	# where the letters of the bottom half of the board start further to the right
+	havannah_notation_list = []
+	my_notation_list = []
+
+	column_ranges = get_valid_column_ranges(side)
+
+	for i in range(0, 2 * side - 1):
+		first_letter = max(0, i - (side - 1))
+		for j in range(column_ranges[i][0], column_ranges[i][1] + 1):
+			havannah_notation_string = str(i + 1) + ' ' + get_column_label(first_letter + j - column_ranges[i][0])
+			havannah_notation_list.append(havannah_notation_string)
+
+			my_notation_string = str(i) + ' ' + str(j)
+			my_notation_list.append(my_notation_string)
+
+	havannah_to_my_notation_dict = dict(zip(havannah_notation_list, my_notation_list))
+	my_notation_to_havannah_dict = dict(zip(my_notation_list, havannah_notation_list))
+
+	return havannah_to_my_notation_dict, my_notation_to_havannah_dict
+
+
+def create_segment_table():
+	# segment code (base 3, one digit per hexagon) -> score
+	segment_table = []
+	for code in range(3 ** SEGMENT_LENGTH):
+		cells = [(code // 3 ** i) % 3 for i in range(SEGMENT_LENGTH)]
+		if cells.count(PLAYER_2) == 0:
+			segment_table.append(SEGMENT_SCORES[cells.count(PLAYER_1)])
+		elif cells.count(PLAYER_1) == 0:
+			segment_table.append(-SEGMENT_SCORES[cells.count(PLAYER_2)])
+		else:
+			segment_table.append(0)
+
+	return segment_table
+
+
+def create_ring_table():
+	# ring code (centre + 3 * neighbours in base 4) -> score
+	ring_table = []
+	for code in range(3 * 4 ** 6):
+		centre = code % 3
+		neighbours = [(code // 3 // 4 ** i) % 4 for i in range(6)]
+		if centre == 0 or OFF_BOARD in neighbours:
+			ring_table.append(0)
+		elif centre == PLAYER_2:
+			ring_table.append(RING_SCORES[neighbours.count(PLAYER_1)])
+		else:
+			ring_table.append(-RING_SCORES[neighbours.count(PLAYER_2)])
+
+	return ring_table
+
+
+SEGMENT_TABLE = create_segment_table()
+RING_TABLE = create_ring_table()
+
+
+class BoardGeometry:
+	# Everything which depends only on the board size, generated once per size (see get_board_geometry)
+	def __init__(self, side):
+		self.side = side
+		self.hexagons = get_valid_hexagons(side)
+		self.hexagons_by_coordinates = {(hex.row, hex.column): hex for hex in self.hexagons}
+
+		self.central_hexagon = self.hexagons_by_coordinates[(side - 1, side - 1)]
+
+		# hexagon -> list of its neighbours on the board
+		self.neighbours = {}
+		for hex in self.hexagons:
+			neighbours = []
+			for direction in ALL_DIRECTIONS:
+				neighbour = self.hexagons_by_coordinates.get(determine_next_hex_coordinates(hex.row, hex.column, direction))
+				if neighbour is not None:
+					neighbours.append(neighbour)
+			self.neighbours[hex] = neighbours
+
+		# hexagon -> direction -> hexagons from the nearest one up to the border (excluding the hexagon itself)
+		self.rays = {}
+		for hex in self.hexagons:
+			self.rays[hex] = {}
+			for direction in ALL_DIRECTIONS:
+				ray = []
+				next_hex = self.hexagons_by_coordinates.get(determine_next_hex_coordinates(hex.row, hex.column, direction))
+				while next_hex is not None:
+					ray.append(next_hex)
+					next_hex = self.hexagons_by_coordinates.get(determine_next_hex_coordinates(next_hex.row, next_hex.column, direction))
+				self.rays[hex][direction] = ray
+
+		self.board_key, self.zobrist_keys = generate_zobrist_keys(self.hexagons, side)
+
+		# Pattern windows: segments of SEGMENT_LENGTH hexagons along the three axes and the rings around each hexagon
+		self.segments = []
+		for hex in self.hexagons:
+			for direction in [DIRECTION_RIGHT, DIRECTION_UPPER_RIGHT, DIRECTION_BOTTOM_RIGHT]:
+				if len(self.rays[hex][direction]) >= SEGMENT_LENGTH - 1:
+					self.segments.append([hex] + self.rays[hex][direction][:SEGMENT_LENGTH - 1])
+
+		self.rings = {hex: [self.hexagons_by_coordinates.get(determine_next_hex_coordinates(hex.row, hex.column, direction)) for direction in ALL_DIRECTIONS]
+					  for hex in self.hexagons}
+
+		# hexagon -> (segment, weight of the hexagon in the segment code) for the segments containing it
+		self.segments_by_hexagon = {hex: [] for hex in self.hexagons}
+		for segment in self.segments:
+			for i in range(SEGMENT_LENGTH):
+				self.segments_by_hexagon[segment[i]].append((segment, 3 ** i))
+
+		# hexagon -> (ring centre, weight of the hexagon in the ring code) for the rings containing it
+		self.rings_by_hexagon = {hex: [(hex, 1)] for hex in self.hexagons}
+		for centre, ring in self.rings.items():
+			for i in range(6):
+				if ring[i] is not None:
+					self.rings_by_hexagon[ring[i]].append((centre, 3 * 4 ** i))
+
+		# Above the absolute value of any pattern_score, the evaluate_patterns value of a won position
+		self.pattern_win_score = len(self.segments) * max(SEGMENT_SCORES) + len(self.hexagons) * max(RING_SCORES) + 1
+
+		self.havannah_to_my_notation_dict, self.my_notation_to_havannah_dict = generate_conversion_dictionaries(side)
+
+
+board_geometries = {}
+
+def get_board_geometry(side=DEFAULT_BOARD_SIDE):
+	if side not in board_geometries:
+		board_geometries[side] = BoardGeometry(side)
+
+	return board_geometries[side]
+
+
 class BoardState:
-	valid_hexagons = get_valid_hexagons()
+	def __init__(self, player1_hexagons, player2_hexagons, last_move_hex, game_round, current_player, position_hash=None, geometry=None, parent_pattern_score=None):
+		self.geometry = geometry if geometry is not None else get_board_geometry()
 
-	def __init__(self, player1_hexagons, player2_hexagons, last_move_hex, game_round, current_player):
 		self.player1_hexagons = player1_hexagons # created separately for each BoardState -> COPY of the list with extra element added
 		self.player2_hexagons = player2_hexagons # [as above for p1]
 
+		# Constant time membership tests (the lists keep the order of the moves)
+		self.player1_set = set(player1_hexagons)
+		self.player2_set = set(player2_hexagons)
+
 		# Used to determine appropriate valid moves (especially with respect to the first and second round)
-		self.game_round = game_round 
+		self.game_round = game_round
 
-		# Necessarily called after p1 and p2 hexagon lists and game_round have been already initialised
-		self.valid_moves = self.get_valid_moves() # created (generated) separately for each BoardState
 		self.last_move_hex = last_move_hex
-		
+
 		self.current_player = current_player
 
-		self.terminal_node = self.check_if_win()
+		# valid_moves and terminal_node are computed on first access (e.g. not at all for leaves which are only evaluated)
 
+		# pattern_score of the state before the last move, if it was already computed (then only the last move is scored)
+		self.parent_pattern_score = parent_pattern_score
 
-	def get_hexagon_neighbours(self, hexagon):
-		hex_r = hexagon.row
-		hex_c = hexagon.column
+		# Hash of the stones on the board, updated incrementally by make_move
+		if position_hash is None:
+			position_hash = self.compute_position_hash()
+		self.position_hash = position_hash
 
-		neighbours_coordinates = [(hex_r, hex_c - 1), (hex_r, hex_c + 1), (hex_r - 1, hex_c), (hex_r + 1, hex_c)]
-		if hex_r % 2 == 0:
-			neighbours_coordinates.extend([(hex_r - 1, hex_c - 1), (hex_r + 1, hex_c - 1)])
-		else:
-			neighbours_coordinates.extend([(hex_r - 1, hex_c + 1), (hex_r + 1, hex_c + 1)])
 
-		neighbours = []
-		for hex in BoardState.valid_hexagons:
-			if (hex.row, hex.column) in neighbours_coordinates:
-				neighbours.append(hex)
+	@cached_property
+	def valid_moves(self):
+		return self.get_valid_moves() # created (generated) separately for each BoardState
 
-		return neighbours
+
+	@cached_property
+	def terminal_node(self):
+		return self.check_if_win()
+
+
+	@cached_property
+	def pattern_score(self):
+		# Sum of the pattern scores of the whole board (player 1 point of view), updated incrementally
+		if self.parent_pattern_score is None:
+			return self.compute_pattern_score()
+
+		player = PLAYER_1 if self.last_move_hex in self.player1_set else PLAYER_2
+
+		return self.parent_pattern_score + self.get_pattern_delta(self.last_move_hex, player)
+
+
+	def compute_position_hash(self):
+		position_hash = self.geometry.board_key
+		for p1 in self.player1_hexagons:
+			position_hash ^= self.geometry.zobrist_keys[p1][0]
+		for p2 in self.player2_hexagons:
+			position_hash ^= self.geometry.zobrist_keys[p2][1]
+
+		return position_hash
+
+
+	def get_evaluation_key(self):
+		# evaluate_state depends on the last move as well, not only on the stones
+		if self.last_move_hex is None:
+			return self.position_hash
+
+		return self.position_hash ^ self.geometry.zobrist_keys[self.last_move_hex][2]
+
+
+	def get_hexagon_neighbours(self, hexagon):
+		return self.geometry.neighbours[hexagon]
 
 
 	def get_valid_moves(self):
 		if self.game_round == 1:
-			valid_moves = [hex for hex in BoardState.valid_hexagons if hex.row == CENTRAL_HEXAGON_ROW and hex.column == CENTRAL_HEXAGON_COLUMN]
+			valid_moves = [self.geometry.central_hexagon]
 		elif self.game_round == 2:
 			# player 1 always goes first, so all of his first move neighbours are desired at this state
-			valid_moves = self.get_hexagon_neighbours(self.player1_hexagons[0])
+			valid_moves = list(self.get_hexagon_neighbours(self.player1_hexagons[0]))
 		else:
-			# Put all neigbours in one big list (with repetitions)
-			all_neighbours = []
-			for p1 in self.player1_hexagons:
-				all_neighbours.extend(self.get_hexagon_neighbours(p1))
-			for p2 in self.player2_hexagons:
-				all_neighbours.extend(self.get_hexagon_neighbours(p2))
-
-			# Remove Neighbours that are occupied by player moves
-			all_neighbours = [n for n in all_neighbours if n not in self.player1_hexagons and n not in self.player2_hexagons]
+			# Count, for every free hexagon, the number of neighbouring stones
+			neighbour_counts = Counter()
+			for p in self.player1_hexagons + self.player2_hexagons:
+				for n in self.get_hexagon_neighbours(p):
+					if n not in self.player1_set and n not in self.player2_set:
+						neighbour_counts[n] += 1
 
-			# Find valid moves as neighbours intersections
-			valid_moves = [hex for hex in set(all_neighbours) if all_neighbours.count(hex) > 1]
+			# Valid moves are adjacent to at least two stones
+			valid_moves = [hex for hex, count in neighbour_counts.items() if count > 1]
 
 		return valid_moves
 
 
 	def make_move(self, input_row, input_column):
-		for hex in BoardState.valid_hexagons:
-			if(hex.row == input_row and hex.column == input_column):
-				# Check whether the move is legal
-				# * not overlapping
-				if (hex in self.player1_hexagons or hex in self.player2_hexagons):
-					print("Invalid move [overlapping]")
-					return False, None
-
-				# * legal according to the game rules
-				if hex not in self.valid_moves:
-					print("Invalid move [by rules, adjacency violation]")
-					return False, None
-
-				new_player1_hexagons = self.player1_hexagons.copy()
-				new_player2_hexagons = self.player2_hexagons.copy()
-
-				if len(self.player1_hexagons) <= len(self.player2_hexagons): # TO BE CHANGED (?)
-					new_player1_hexagons.append(hex)
-				else:
-					new_player2_hexagons.append(hex)
+		hex = self.geometry.hexagons_by_coordinates.get((input_row, input_column))
+		if hex is None:
+			print("Invalid move [outside the grid]")
+			return False, None
+
+		# Check whether the move is legal
+		# * not overlapping
+		if (hex in self.player1_set or hex in self.player2_set):
+			print("Invalid move [overlapping]")
+			return False, None
+
+		# * legal according to the game rules
+		if hex not in self.valid_moves:
+			print("Invalid move [by rules, adjacency violation]")
+			return False, None
+
+		new_player1_hexagons = self.player1_hexagons.copy()
+		new_player2_hexagons = self.player2_hexagons.copy()
+
+		if len(self.player1_hexagons) <= len(self.player2_hexagons): # TO BE CHANGED (?)
+			new_player1_hexagons.append(hex)
+			new_position_hash = self.position_hash ^ self.geometry.zobrist_keys[hex][0]
+		else:
+			new_player2_hexagons.append(hex)
+			new_position_hash = self.position_hash ^ self.geometry.zobrist_keys[hex][1]
 
-				next_player = PLAYER_1 if self.current_player == PLAYER_2 else PLAYER_2
+		next_player = PLAYER_1 if self.current_player == PLAYER_2 else PLAYER_2
 
-				return True, BoardState(new_player1_hexagons, new_player2_hexagons, hex, self.game_round + 1, next_player)
+		# cached_property keeps a computed pattern_score in the instance dictionary; the child does not keep this state alive
+		parent_pattern_score = self.__dict__.get("pattern_score")
 
-		print("Invalid move [outside the grid]")
-		return False, None
+		return True, BoardState(new_player1_hexagons, new_player2_hexagons, hex, self.game_round + 1, next_player, new_position_hash, self.geometry, parent_pattern_score)
 
 	def evaluate_state(self):
 		horizontal = self.check_line_horizontal()
@@ -169,19 +428,84 @@ class BoardState:
 		#last player was p2
 		if self.current_player == PLAYER_1:
 			for lmn in last_move_neighbours:
-				if lmn in self.player2_hexagons:
+				if lmn in self.player2_set:
 					last_move_adjacent_to_the_same_player = True
 		else:
 			for lmn in last_move_neighbours:
-				if lmn in self.player1_hexagons:
+				if lmn in self.player1_set:
 					last_move_adjacent_to_the_same_player = True
 
 		if not last_move_adjacent_to_the_same_player:
 			value -=1
-		
+
 		return value
 
 
+	### PATTERN EVALUATION ###
+
+	def evaluate_patterns(self):
+		# Same point of view as evaluate_state: the player who made the last move.
+		# The rings only see the enclosure of a single stone, so a win (always by the last move) is scored on its own.
+		if self.terminal_node:
+			return self.geometry.pattern_win_score
+
+		return self.pattern_score if self.current_player == PLAYER_2 else -self.pattern_score
+
+
+	def get_cell(self, hex):
+		if hex is None:
+			return OFF_BOARD
+		if hex in self.player1_set:
+			return PLAYER_1
+		if hex in self.player2_set:
+			return PLAYER_2
+		return 0
+
+
+	def get_segment_code(self, segment):
+		code = 0
+		weight = 1
+		for hex in segment:
+			code += self.get_cell(hex) * weight
+			weight *= 3
+
+		return code
+
+
+	def get_ring_code(self, centre):
+		code = self.get_cell(centre)
+		weight = 3
+		for hex in self.geometry.rings[centre]:
+			code += self.get_cell(hex) * weight
+			weight *= 4
+
+		return code
+
+
+	def compute_pattern_score(self):
+		score = 0
+		for segment in self.geometry.segments:
+			score += SEGMENT_TABLE[self.get_segment_code(segment)]
+		for centre in self.geometry.hexagons:
+			score += RING_TABLE[self.get_ring_code(centre)]
+
+		return score
+
+
+	def get_pattern_delta(self, hex, player):
+		# Part of pattern_score due to the stone of player on hex; only the windows containing hex change.
+		delta = 0
+		for segment, weight in self.geometry.segments_by_hexagon[hex]:
+			code = self.get_segment_code(segment)
+			delta += SEGMENT_TABLE[code] - SEGMENT_TABLE[code - player * weight]
+
+		for centre, weight in self.geometry.rings_by_hexagon[hex]:
+			code = self.get_ring_code(centre)
+			delta += RING_TABLE[code] - RING_TABLE[code - player * weight]
+
+		return delta
+
+
 	### WINNING CHECK FROM HERE ON ###
 
 	def check_if_win(self):
@@ -211,126 +535,31 @@ class BoardState:
 
 
 	def check_line_horizontal(self):
-		last_hex_row = self.last_move_hex.row
-		last_hex_column = self.last_move_hex.column
-		line_counter = 1
+		rays = self.geometry.rays[self.last_move_hex]
 
-		line_left = [hex for hex in BoardState.valid_hexagons if hex.row == last_hex_row and hex.column < last_hex_column and hex.column >= last_hex_column - 4]
-		line_left.sort(key=lambda x: x.column)
-		line_left.reverse()
-
-		line_right = [hex for hex in BoardState.valid_hexagons if hex.row == last_hex_row and hex.column > last_hex_column and hex.column <= last_hex_column + 4]
-		line_right.sort(key=lambda x: x.column)
-
-		return self.check_if_five_in_line(line_left, line_right)
+		return self.check_if_five_in_line(rays[DIRECTION_LEFT][:4], rays[DIRECTION_RIGHT][:4])
 
 
 	def check_line_ascending(self):
-		last_hex_row = self.last_move_hex.row
-		last_hex_column = self.last_move_hex.column
-
-		line_left = []
-		line_right = []
-		#odd row number
-		if last_hex_row % 2 != 0: 
-			for hex in BoardState.valid_hexagons:
-				if (
-						hex.row == last_hex_row + 1 and hex.column == last_hex_column or
-						hex.row == last_hex_row + 2 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row + 3 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row + 4 and hex.column == last_hex_column - 2
-				  ):
-					line_left.append(hex)
-				elif (
-						hex.row == last_hex_row - 1 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row - 2 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row - 3 and hex.column == last_hex_column + 2 or
-						hex.row == last_hex_row - 4 and hex.column == last_hex_column + 2
-					):
-					line_right.append(hex)
-		#even row number
-		else: 
-			for hex in BoardState.valid_hexagons:
-				if (
-						hex.row == last_hex_row + 1 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row + 2 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row + 3 and hex.column == last_hex_column - 2 or
-						hex.row == last_hex_row + 4 and hex.column == last_hex_column - 2
-				  ):
-					line_left.append(hex)
-				elif (
-						hex.row == last_hex_row - 1 and hex.column == last_hex_column or
-						hex.row == last_hex_row - 2 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row - 3 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row - 4 and hex.column == last_hex_column + 2
-					):
-					line_right.append(hex)
-
-		line_left.sort(key=lambda x: x.row)
-
-		line_right.sort(key=lambda x: x.row)
-		line_right.reverse()
-
-		return self.check_if_five_in_line(line_left, line_right)
+		rays = self.geometry.rays[self.last_move_hex]
+
+		return self.check_if_five_in_line(rays[DIRECTION_BOTTOM_LEFT][:4], rays[DIRECTION_UPPER_RIGHT][:4])
 
 
 	def check_line_descending(self):
-		last_hex_row = self.last_move_hex.row
-		last_hex_column = self.last_move_hex.column
-
-		line_left = []
-		line_right = []
-		#odd row number
-		if last_hex_row % 2 != 0: 
-			for hex in BoardState.valid_hexagons:
-				if (
-						hex.row == last_hex_row + 1 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row + 2 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row + 3 and hex.column == last_hex_column + 2 or
-						hex.row == last_hex_row + 4 and hex.column == last_hex_column + 2
-				  ):
-					line_right.append(hex)
-				elif (
-						hex.row == last_hex_row - 1 and hex.column == last_hex_column or
-						hex.row == last_hex_row - 2 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row - 3 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row - 4 and hex.column == last_hex_column - 2
-					):
-					line_left.append(hex)
-		#even row number
-		else: 
-			for hex in BoardState.valid_hexagons:
-				if (
-						hex.row == last_hex_row + 1 and hex.column == last_hex_column or
-						hex.row == last_hex_row + 2 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row + 3 and hex.column == last_hex_column + 1 or
-						hex.row == last_hex_row + 4 and hex.column == last_hex_column + 2
-				  ):
-					line_right.append(hex)
-				elif (
-						hex.row == last_hex_row - 1 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row - 2 and hex.column == last_hex_column - 1 or
-						hex.row == last_hex_row - 3 and hex.column == last_hex_column - 2 or
-						hex.row == last_hex_row - 4 and hex.column == last_hex_column - 2
-					):
-					line_left.append(hex)
-
-		line_left.sort(key=lambda x: x.row)
-		line_left.reverse()
-
-		line_right.sort(key=lambda x: x.row)
-		
-		return self.check_if_five_in_line(line_left, line_right)
+		rays = self.geometry.rays[self.last_move_hex]
+
+		return self.check_if_five_in_line(rays[DIRECTION_UPPER_LEFT][:4], rays[DIRECTION_BOTTOM_RIGHT][:4])
 
 
 	def check_if_five_in_line(self, line_left, line_right):
-		last_move_player_hexagons = self.player2_hexagons if self.current_player == PLAYER_1 else self.player1_hexagons
+		last_move_player_hexagons = self.player2_set if self.current_player == PLAYER_1 else self.player1_set
 		line_counter = 1
 
 		for hex in line_left:
 			if hex in last_move_player_hexagons:
 				line_counter += 1
-			else: 
+			else:
 				break
 
 		if line_counter == 5:
@@ -341,9 +570,9 @@ class BoardState:
 				line_counter += 1
 				if line_counter == 5:
 					return line_counter
-			else: 
+			else:
 				break
-				
+
 		return line_counter
 
 
@@ -353,8 +582,13 @@ class BoardState:
 		if currently_considered == None: #For check_if_win when initializing the first state
 			return False
 
+		# (first line of the condition) last move belongs to player 1
+		last_move_player_hexagons = self.player1_set if self.current_player == PLAYER_2 else self.player2_set
+		enclosed_player_hexagons = self.player2_set if self.current_player == PLAYER_2 else self.player1_set
+
 		open_list = []
-		closed_list = []
+		closed_set = set()
+		can_see_the_border = {} # hexagon -> result of check_if_can_see_the_border, computed once per hexagon
 
 		while True:
 			can_see_border_list = []
@@ -363,133 +597,58 @@ class BoardState:
 
 			# restrict considered neighbours
 			for n in neighbours:
-				# (first line of the condition) last move belongs to player 1
-				if (self.current_player == PLAYER_2 and n in self.player1_hexagons) or \
-				   (self.current_player == PLAYER_1 and n in self.player2_hexagons):
-				   	continue
+				if n in last_move_player_hexagons:
+					continue
 
-				if self.check_if_can_see_the_border(n):
+				if n not in can_see_the_border:
+					can_see_the_border[n] = self.check_if_can_see_the_border(n)
+
+				if can_see_the_border[n]:
 					can_see_border_list.append(n)
 					continue
 
-				if n in closed_list:
+				if n in closed_set:
 					continue
 
 				considered_neighbours.append(n)
-			
-			to_be_removed_hexes = []
-
-			# gather the candidates neighbours of whom can see the border of the board
-			for cn in considered_neighbours:
-				for n in self.get_hexagon_neighbours(cn):
-					if n in can_see_border_list:
-						to_be_removed_hexes.append(cn)
 
-			# discard the candidates gathered above
-			for tbr in to_be_removed_hexes:
-				if tbr in considered_neighbours: #Extra Sanity check
-					considered_neighbours.remove(tbr)
+			# discard the candidates neighbours of whom can see the border of the board
+			considered_neighbours = [cn for cn in considered_neighbours
+									 if not any(n in can_see_border_list for n in self.get_hexagon_neighbours(cn))]
 
 			open_list.extend(considered_neighbours)
-			closed_list.append(currently_considered)	
+			closed_set.add(currently_considered)
+
+			# Skip the hexagons which have been reached more than once
+			while len(open_list) > 0 and open_list[-1] in closed_set:
+				open_list.pop()
 
 			if len(open_list) == 0:
 				break
 
-			currently_considered = open_list.pop(0)
-
-		closed_list.pop(0)
-
-		# At least one white enclosed
-		if len(closed_list) > 0 and self.current_player == PLAYER_2:
-			for hex in closed_list:
-				if hex in self.player2_hexagons:
-					return True
-			return False
+			currently_considered = open_list.pop()
 
-		# At least one black enclosed
-		elif len(closed_list) > 0 and self.current_player == PLAYER_1:
-			for hex in closed_list:
-				if hex in self.player1_hexagons:
-					return True
-			return False
+		closed_set.discard(self.last_move_hex)
 
-		else:
-			return False
+		# At least one stone of the opponent of the last move player enclosed
+		return not closed_set.isdisjoint(enclosed_player_hexagons)
 
 
 	def check_if_can_see_the_border(self, current_hex):
-		if self.check_side_of_direction(current_hex, DIRECTION_LEFT):
-			return True
-
-		if self.check_side_of_direction(current_hex, DIRECTION_UPPER_LEFT):
-			return True
-
-		if self.check_side_of_direction(current_hex, DIRECTION_UPPER_RIGHT):
-			return True
-
-		if self.check_side_of_direction(current_hex, DIRECTION_RIGHT):
-			return True
-
-		if self.check_side_of_direction(current_hex, DIRECTION_BOTTOM_RIGHT):
-			return True
-
-		if self.check_side_of_direction(current_hex, DIRECTION_BOTTOM_LEFT):
-			return True
+		for direction in ALL_DIRECTIONS:
+			if self.check_side_of_direction(current_hex, direction):
+				return True
 
 		return False
 
 
 	def check_side_of_direction(self, current_hex, direction):
-		current_hex_row = current_hex.row
-		current_hex_column = current_hex.column
-
-		while True:
-			#Single Step
-			current_hex_row, current_hex_column = self.determine_next_hex_coordinates(current_hex_row, current_hex_column, direction)
-
-			considered_hexagon = None
-
-			for hex in BoardState.valid_hexagons:
-				if (hex.row == current_hex_row and hex.column == current_hex_column):
-					considered_hexagon = hex
-					break
+		# Since it's the enclosing condtion: current player different than playerN_hexagons)
+		# Current p2, so last move belongs to p1. We consider "blocking the visibility" as p1 blocking view of p2
+		blocking_hexagons = self.player1_set if self.current_player == PLAYER_2 else self.player2_set
 
-			if considered_hexagon == None: #It means that the border has been reached
-				return True 
-
-			# Since it's the enclosing condtion: current player different than playerN_hexagons)
-			# Current p2, so last move belongs to p1. We consider "blocking the visibility" as p1 blocking view of p2
-			if (self.current_player == PLAYER_2 and considered_hexagon in self.player1_hexagons) or \
-			   (self.current_player == PLAYER_1 and considered_hexagon in self.player2_hexagons):
+		for considered_hexagon in self.geometry.rays[current_hex][direction]:
+			if considered_hexagon in blocking_hexagons:
 				return False
 
-
-	def determine_next_hex_coordinates(self, current_row, current_column, direction):
-		if direction == DIRECTION_LEFT:
-			return (current_row, current_column - 1)
-
-		if direction == DIRECTION_RIGHT:
-			return (current_row, current_column + 1)
-
-		if direction == DIRECTION_UPPER_LEFT:
-			if current_row %2 == 0:
-				current_column -= 1
-			return (current_row - 1, current_column)
-
-		if direction == DIRECTION_UPPER_RIGHT:
-			if current_row %2 != 0:
-				current_column += 1
-			return (current_row - 1, current_column)
-
-		if direction == DIRECTION_BOTTOM_LEFT:
-			if current_row %2 == 0:
-				current_column -= 1
-			return (current_row + 1, current_column)
-
-		if direction == DIRECTION_BOTTOM_RIGHT:
-			if current_row %2 != 0:
-				current_column += 1
-			return (current_row + 1, current_column)
-
-		return (current_row, current_column)
+		return True #It means that the border has been reached
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+
+class EvaluationCache:
+	def __init__(self, max_entries):
+		self.max_entries = max_entries
+		self.entries = OrderedDict() # evaluation key -> value, least recently used first
+
+		self.hits = 0
+		self.misses = 0
+
+	def evaluate(self, board_state):
+		key = board_state.get_evaluation_key()
+
+		value = self.entries.get(key)
+		if value is not None:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return value
+
+		self.misses += 1
+		value = board_state.evaluate_state()
+
+		self.entries[key] = value
+		if len(self.entries) > self.max_entries:
+			self.entries.popitem(last=False) # evict the least recently used entry
+
+		return value
+
+	def reset_statistics(self):
+		self.hits = 0
+		self.misses = 0
+
+	def clear(self):
+		self.entries.clear()
+		self.reset_statistics()
+
+	def __str__(self):
+		lookups = self.hits + self.misses
+		hit_rate = 100 * self.hits / lookups if lookups > 0 else 0
+
+		return "Evaluation cache: {} hits, {} misses ({:.1f}% hit rate), {}/{} entries".format(
+			self.hits, self.misses, hit_rate, len(self.entries), self.max_entries)
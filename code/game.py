@@ -1,48 +1,24 @@
 import pygame
 import sys
 import time
-from func_timeout import func_timeout, FunctionTimedOut
 
 from boardclasses import *
+from search import *
+from timemanager import TimeManager
+from profiler import profile_moves
 
 
-# Such numbers so as to simplify the debugging process
-MAX_TYPE = 3
-MIN_TYPE = 4
 ITERATIVE_DEEPENING = True
 
+# Number of hexagons along each side of the board (the standard board has 10)
+BOARD_SIDE = DEFAULT_BOARD_SIDE
 
-def generate_conversion_dictionaries():
-	letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S']
-	numbers = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19']
+# Game clock of the AI player (seconds), with the increment added after each of its moves
+GAME_TIME = 5 * 60
+TIME_INCREMENT = 2
 
-	havannah_notation_list = []
-	for i in list(range(10, 20)):
-		number = numbers[i - 10]
-		for j in range(0, i):
-			havannah_notation_string = number + ' ' + letters[j]
-			havannah_notation_list.append(havannah_notation_string)
-
-	for i in list(range(10, 19)):
-		number = numbers[i]
-		for j in range(28 - i):
-			havannah_notation_string = number + ' ' + letters[j + i - 9]
-			havannah_notation_list.append(havannah_notation_string)
-
-	my_notation_list = []
-
-	column_ranges = [(5,14), (4,14), (4,15), (3,15), (3,16), (2,16), (2,17), (1,17), (1,18), (0,18), 
-					 (1,18), (1,17), (2,17), (2,16), (3,16), (3,15), (4,15), (4,14), (5,14)]
-
-	for i in range(0,19):
-		for j in range(column_ranges[i][0], column_ranges[i][1] + 1):
-			my_notation_string = str(i) + ' ' + str(j)
-			my_notation_list.append(my_notation_string)
-
-	havannah_to_my_notation_dict = dict(zip(havannah_notation_list, my_notation_list))
-	my_notation_to_havannah_dict = dict(zip(my_notation_list, havannah_notation_list))
-
-	return havannah_to_my_notation_dict, my_notation_to_havannah_dict
+# Per-move profiling reports of the AI (can be enabled with the ANDANTINO_PROFILE environment variable as well)
+PROFILING = False
 
 
 def get_haxagon_points(hex_x, hex_y):
@@ -65,167 +41,12 @@ def draw_pawns(pawn_hexagons, color, surface):
 	for hex in pawn_hexagons:
 		pygame.draw.circle(surface, color, (int(hex.x), int(hex.y)), CIRCLE_RADIUS)
 
-
-def perform_iterative_deepening(boardState):
-	THRESHOLD = 3
-	MAX_DEPTH = 20
-	time_out = False
-	depth = 1
-
-	infinity = float('inf')
-	minus_infinity = float('-inf')
-
-	valid_moves = boardState.get_valid_moves()
-	potential_states = [boardState.make_move(vm.row, vm.column)[1] for vm in valid_moves]
-	potential_states.sort(key=lambda state: state.evaluate_state())
-	potential_states.reverse()
-
-	while True:
-		best_score = float('-inf')
-		best_next_state = None	
-
-		time_passed = 0
-
-		for potential_state in potential_states:
-			try:
-				start_time=time.time()
-				#score = func_timeout(THRESHOLD, alpha_beta, (potential_state, depth, minus_infinity, infinity, MAX_TYPE))
-				score = func_timeout(THRESHOLD, pvs, (potential_state, depth, minus_infinity, infinity))
-				end_time=time.time()
-				current_time_passed = end_time - start_time
-				THRESHOLD -= current_time_passed
-			except FunctionTimedOut:
-				print ("TIME OUT!")
-				time_out = True
-				break			
-
-			if score > best_score:
-				best_score = score
-				best_next_state = potential_state
-
-			time_passed = max(current_time_passed, time_passed)
-
-		if time_out:
-			break
-
-		print("Max time for depth {}: {}s".format(depth, time_passed))
-
-		__, boardStateHolder = boardState.make_move(best_next_state.last_move_hex.row, best_next_state.last_move_hex.column)
-
-		depth += 2
-		if depth > MAX_DEPTH:
-			break
-
-	return boardStateHolder
-
-
-def pvs(board_state, depth, alpha, beta):
-	if (board_state.terminal_node or depth == 0):
-		return board_state.evaluate_state()
-
-	valid_moves = board_state.get_valid_moves()
-	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
-	children.sort(key=lambda state: state.evaluate_state())
-	children.reverse()
-
-	for i in range(0, len(children)):
-		if i == 0:
-			score = -pvs(children[i], depth - 1, -beta, -alpha)
-			return score
-		else:
-			score = -pvs(children[i], depth - 1, -alpha - 1, -alpha)
-			if (alpha < score and score < beta):
-				score = -pvs(children[i], depth - 1, -beta, -score)
-
-		alpha = max(alpha, score)
-		if alpha >= beta:
-			break
-
-	return alpha
-
-
-def alpha_beta_negamax(board_state, depth, alpha, beta):
-	if (board_state.terminal_node or depth == 0):
-		return -board_state.evaluate_state()
-
-	valid_moves = board_state.get_valid_moves()
-	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
-
-	children.sort(key=lambda state: state.evaluate_state())
-	children.reverse()
-
-	score = float('-inf')
-
-	for child in children:
-		value = -alpha_beta_negamax(child, depth - 1, -beta, -alpha)
-
-		if value > score:
-			score = value
-
-		if score > alpha:
-			alpha = score
-
-		if score >= beta:
-			break
-
-	return score
-
-
-def alpha_beta(board_state, depth, alpha, beta, player_type):
-	if (board_state.terminal_node or depth == 0):
-		return board_state.evaluate_state()
-
-	valid_moves = board_state.get_valid_moves()
-	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
-
-
-	children.sort(key=lambda state: state.evaluate_state())
-
-	if player_type == MAX_TYPE:
-		children.reverse()
-		score = float('-inf')
-		for child in children:
-			value = alpha_beta(child, depth - 1, alpha, beta, MIN_TYPE)
-			score = max(score, value)
-			alpha = max(alpha, score)
-			if alpha >= beta:
-				break # beta cut-off
-		return score
-	else: # MIN player
-		score = float('inf')
-		for child in children:
-			value = alpha_beta(child, depth - 1, alpha, beta, MAX_TYPE)
-			score = min(score, value)
-			beta = min(beta, score)
-			if alpha >= beta:
-				break # alpha cut-off
-		return score
-
-
-
-def minimax(board_state, depth, player_type):
-	if (board_state.terminal_node or depth == 0):
-		return board_state.evaluate_state()
-
-	valid_moves = board_state.get_valid_moves()
-	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
-
-	if player_type == MAX_TYPE:
-		score = float('-inf')
-		for child in children:
-			value = minimax(child, depth - 1, MIN_TYPE)
-			score = max(score, value)
-	else:
-		score = float('inf')
-		for child in children:
-			value = minimax(child, depth - 1, MAX_TYPE)
-			score = min(score, value)
-
-	return score
-
 # # # # #
 
-window_size = (750, 650)
+board_geometry = get_board_geometry(BOARD_SIDE)
+
+# Large enough for the whole board, with a margin (hexagons start at (50, 50))
+window_size = (int(max(hex.x for hex in board_geometry.hexagons)) + 50, int(max(hex.y for hex in board_geometry.hexagons)) + 50)
 
 pygame.init()
 
@@ -241,7 +62,8 @@ red_color = pygame.color.Color('Red')
 magenta_color = pygame.color.Color(255, 0, 255)
 
 
-havannah_to_my_notation_dict, my_notation_to_havannah_dict = generate_conversion_dictionaries()
+havannah_to_my_notation_dict = board_geometry.havannah_to_my_notation_dict
+my_notation_to_havannah_dict = board_geometry.my_notation_to_havannah_dict
 
 input_row = -1
 input_column = -1
@@ -258,7 +80,11 @@ round_counter = 1
 
 player1_hexagons = []
 player2_hexagons = []
-boardState = BoardState(player1_hexagons, player2_hexagons, None, game_round, PLAYER_1)
+boardState = BoardState(player1_hexagons, player2_hexagons, None, game_round, PLAYER_1, geometry=board_geometry)
+
+time_manager = TimeManager(GAME_TIME, TIME_INCREMENT)
+
+perform_ai_move = profile_moves(perform_iterative_deepening, PROFILING)
 
 while True:
 	for event in pygame.event.get():
@@ -305,9 +131,16 @@ while True:
 						print("\n=== PLAYER 1 (BLACK) WON ===\n")
 
 					print("The game has stopped")
+
+				elif len(boardState.valid_moves) == 0:
+					bg_color = pygame.color.Color('Gray')
+					game_finished = True
+
+					print("\n=== DRAW (NO LEGAL MOVES) ===\n")
+					print("The game has stopped")
 		
 		elif ITERATIVE_DEEPENING: #computer's turn but with iterative deepening
-			boardStateHolder = perform_iterative_deepening(boardState)
+			boardStateHolder = perform_ai_move(boardState, time_manager)
 			boardState = boardStateHolder
 
 			round_counter += 1
@@ -332,9 +165,16 @@ while True:
 					print("\n=== PLAYER 1 (BLACK) WON ===\n")
 
 				print("The game has stopped")
+
+			elif len(boardState.valid_moves) == 0:
+				bg_color = pygame.color.Color('Gray')
+				game_finished = True
+
+				print("\n=== DRAW (NO LEGAL MOVES) ===\n")
+				print("The game has stopped")
 		
 		else: # computer's turn (no iterative deepening)
-			valid_moves = boardState.get_valid_moves()
+			valid_moves = boardState.valid_moves
 
 			best_score = float('-inf')
 			best_next_state = None
@@ -343,7 +183,7 @@ while True:
 			minus_infinity = float('-inf')
 			
 			potential_states = [boardState.make_move(vm.row, vm.column)[1] for vm in valid_moves]
-			potential_states.sort(key=lambda state: state.evaluate_state())
+			potential_states.sort(key=lambda state: evaluate(state))
 			potential_states.reverse()
 
 			start_time_measurement = time.time()
@@ -359,8 +199,7 @@ while True:
 				#score = alpha_beta(potential_state, 5, minus_infinity, infinity, MAX_TYPE)
 				#print("Score after alpha beta (normal): {}".format(score))
 
-				score = pvs(potential_state, 5, minus_infinity, infinity)
-				score = math.fabs(score)
+				score = -pvs(potential_state, 5, minus_infinity, infinity)
 				print("Score after pvs: {}".format(score))
 
 				if score > best_score:
@@ -396,12 +235,19 @@ while True:
 					print("\n=== PLAYER 1 (BLACK) WON ===\n")
 
 				print("The game has stopped")
+
+			elif len(boardState.valid_moves) == 0:
+				bg_color = pygame.color.Color('Gray')
+				game_finished = True
+
+				print("\n=== DRAW (NO LEGAL MOVES) ===\n")
+				print("The game has stopped")
 		
 		
 	# Draw everything
 	surface.fill(bg_color)
 
-	draw_grid(BoardState.valid_hexagons, polygon_color, surface)
+	draw_grid(board_geometry.hexagons, polygon_color, surface)
 
 	draw_pawns(boardState.player1_hexagons, black_color, surface)
 	draw_pawns(boardState.player2_hexagons, white_color, surface)
@@ -0,0 +1,169 @@
+import cProfile
+import io
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+
+from boardclasses import BoardState
+
+
+# Settings, each of them can be overridden by an environment variable
+PROFILE_ENV = "ANDANTINO_PROFILE" # set to 1 to enable the profiling
+PROFILE_DIR_ENV = "ANDANTINO_PROFILE_DIR"
+PROFILE_KEEP_ENV = "ANDANTINO_PROFILE_KEEP"
+PROFILE_SAMPLE_ENV = "ANDANTINO_PROFILE_SAMPLE_MS"
+
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_PROFILE_KEEP = 20 # reports of older moves are removed
+DEFAULT_SAMPLE_INTERVAL = 0 # milliseconds between two stack samples, 0 disables the sampling
+
+HOT_FUNCTIONS_COUNT = 25
+
+# Before Python 3.12 cProfile only sees the thread which enabled it (func_timeout searches in its own thread)
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+def profiling_enabled(enabled_by_config=False):
+	return enabled_by_config or os.environ.get(PROFILE_ENV, "0") not in ("", "0")
+
+
+def profile_moves(function, enabled_by_config=False):
+	# When disabled the function itself is returned, so the profiling costs nothing
+	if not profiling_enabled(enabled_by_config):
+		return function
+
+	profiler = MoveProfiler(os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR),
+							int(os.environ.get(PROFILE_KEEP_ENV, DEFAULT_PROFILE_KEEP)),
+							float(os.environ.get(PROFILE_SAMPLE_ENV, DEFAULT_SAMPLE_INTERVAL)) / 1000)
+
+	def profiled_function(boardState, *args):
+		return profiler.profile_move(function, boardState, *args)
+
+	return profiled_function
+
+
+class StackSampler(threading.Thread):
+	def __init__(self, interval):
+		threading.Thread.__init__(self, daemon=True)
+		self.interval = interval
+		self.stacks = Counter() # collapsed stack ("outer;...;inner") -> number of samples
+		self.stopped = threading.Event()
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			for thread_id, frame in sys._current_frames().items():
+				if thread_id == self.ident:
+					continue
+
+				stack = []
+				while frame is not None:
+					stack.append("{}:{}".format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+					frame = frame.f_back
+				stack.reverse()
+
+				self.stacks[";".join(stack)] += 1
+
+	def stop(self):
+		self.stopped.set()
+		self.join()
+
+
+class MoveProfiler:
+	def __init__(self, output_dir, keep_count, sample_interval):
+		self.output_dir = output_dir
+		self.keep_count = keep_count
+		self.sample_interval = sample_interval
+		self.move_counter = 0
+		self.session = time.strftime("%Y%m%d-%H%M%S") # keeps the reports of consecutive runs in chronological order
+
+		self.thread_profiles = []
+		self.thread_profiles_lock = threading.Lock()
+
+	def start_thread_profile(self, frame, event, arg):
+		# Installed by threading.setprofile, called once in every thread started during the move
+		profile = cProfile.Profile()
+		with self.thread_profiles_lock:
+			self.thread_profiles.append(profile)
+		profile.enable()
+
+	def profile_move(self, function, boardState, *args):
+		self.move_counter += 1
+		self.thread_profiles = []
+
+		sampler = None
+		if self.sample_interval > 0:
+			sampler = StackSampler(self.sample_interval)
+			sampler.start()
+
+		main_profile = cProfile.Profile()
+		if PER_THREAD_PROFILES:
+			threading.setprofile(self.start_thread_profile)
+
+		start_time = time.time()
+		main_profile.enable()
+		try:
+			return function(boardState, *args)
+		finally:
+			main_profile.disable()
+			move_time = time.time() - start_time
+
+			if PER_THREAD_PROFILES:
+				threading.setprofile(None)
+			if sampler is not None:
+				sampler.stop()
+
+			stats = pstats.Stats(main_profile)
+			for profile in self.thread_profiles:
+				stats.add(profile)
+
+			self.write_report(boardState.game_round, move_time, stats, sampler)
+
+	def write_report(self, game_round, move_time, stats, sampler):
+		move_dir = os.path.join(self.output_dir, "move_{}_{:04d}_round_{:03d}".format(self.session, self.move_counter, game_round))
+		os.makedirs(move_dir, exist_ok=True)
+
+		stats.dump_stats(os.path.join(move_dir, "profile.prof"))
+
+		with open(os.path.join(move_dir, "report.txt"), "w") as report:
+			report.write("Move {} (game round {}): {:.3f}s\n\n".format(self.move_counter, game_round, move_time))
+
+			report.write("BoardState methods (cumulative time, calls):\n")
+			for name, calls, cumulative_time in self.get_board_state_methods(stats):
+				report.write("  {:<40} {:>10.4f}s {:>10}\n".format(name, cumulative_time, calls))
+
+			report.write("\nHot functions (by own time):\n")
+			stream = io.StringIO()
+			stats.stream = stream
+			stats.sort_stats(pstats.SortKey.TIME).print_stats(HOT_FUNCTIONS_COUNT)
+			report.write(stream.getvalue())
+
+		if sampler is not None:
+			# Collapsed stacks, the input format of flamegraph.pl and compatible tools
+			with open(os.path.join(move_dir, "stacks.folded"), "w") as folded:
+				for stack, count in sampler.stacks.most_common():
+					folded.write("{} {}\n".format(stack, count))
+
+		self.remove_old_reports()
+
+	def get_board_state_methods(self, stats):
+		# (name, first line) pairs, so that e.g. Hexagon.__init__ is not taken for BoardState.__init__
+		method_keys = set((name, method.__code__.co_firstlineno) for name, method in vars(BoardState).items() if hasattr(method, "__code__"))
+
+		methods = []
+		for (filename, line, name), (primitive_calls, calls, own_time, cumulative_time, callers) in stats.stats.items():
+			if os.path.basename(filename) == "boardclasses.py" and (name, line) in method_keys:
+				methods.append((name, calls, cumulative_time))
+
+		methods.sort(key=lambda method: method[2], reverse=True)
+
+		return methods
+
+	def remove_old_reports(self):
+		move_dirs = sorted(entry for entry in os.listdir(self.output_dir) if entry.startswith("move_"))
+
+		for move_dir in move_dirs[:max(len(move_dirs) - self.keep_count, 0)]:
+			shutil.rmtree(os.path.join(self.output_dir, move_dir))
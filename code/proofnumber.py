@@ -0,0 +1,145 @@
+from boardclasses import *
+from transpositiontable import TranspositionTable
+
+
+# Depth-first proof-number search (df-pn) for forced wins by five in a row or by enclosure.
+# In every node phi is the proof number of "the player to move reaches the goal" and delta its disproof number:
+# phi = min(delta of the children), delta = sum(phi of the children).
+
+INFINITY = 10 ** 9
+
+PROVEN_WIN = 1
+PROVEN_LOSS = 2
+UNKNOWN = 3
+
+# Maximum number of (position, remaining depth) entries kept in memory
+PROOF_TABLE_SIZE = 200000
+
+
+class NodeBudgetExceeded(Exception):
+	pass
+
+
+class ProofResult:
+	def __init__(self, status, winning_line, nodes):
+		self.status = status # for the player to move in the root
+		self.winning_line = winning_line # moves (row, column) of the winner, starting in the root, for a proven result
+		self.nodes = nodes
+
+	def __str__(self):
+		names = {PROVEN_WIN: "proven win", PROVEN_LOSS: "proven loss", UNKNOWN: "unknown"}
+		return "Proof-number search: {} after {} nodes, line: {}".format(names[self.status], self.nodes, self.winning_line)
+
+
+class ProofNumberSolver:
+	def __init__(self, max_nodes, max_depth):
+		self.max_nodes = max_nodes
+		self.max_depth = max_depth # in plies, positions deeper than this count as not reaching the goal
+		self.table = TranspositionTable(PROOF_TABLE_SIZE)
+		self.nodes = 0
+
+	def solve(self, board_state):
+		self.nodes = 0
+
+		# First try to prove a win of the player to move, then a win of the opponent
+		for attacker, status in [(board_state.current_player, PROVEN_WIN), (get_opponent(board_state.current_player), PROVEN_LOSS)]:
+			self.table.clear()
+			try:
+				self.search(board_state, attacker, self.max_depth, INFINITY, INFINITY)
+			except NodeBudgetExceeded:
+				return ProofResult(UNKNOWN, [], self.nodes)
+
+			phi, delta = self.lookup(board_state, attacker, self.max_depth)
+			attacker_proven = phi == 0 if board_state.current_player == attacker else delta == 0
+			if attacker_proven:
+				return ProofResult(status, self.get_winning_line(board_state, attacker), self.nodes)
+
+		return ProofResult(UNKNOWN, [], self.nodes)
+
+	def get_key(self, board_state, depth):
+		return (board_state.get_evaluation_key(), depth)
+
+	def lookup(self, board_state, attacker, depth):
+		if board_state.terminal_node:
+			# The last move won, so the player to move has lost
+			return INFINITY, 0
+
+		if depth == 0 or len(board_state.valid_moves) == 0:
+			# The attacker does not reach the goal (beyond the horizon or no moves left)
+			return (INFINITY, 0) if board_state.current_player == attacker else (0, INFINITY)
+
+		entry = self.table.lookup(self.get_key(board_state, depth))
+		if entry is None:
+			return 1, 1
+
+		return entry
+
+	def search(self, board_state, attacker, depth, phi_threshold, delta_threshold):
+		self.nodes += 1
+		if self.nodes > self.max_nodes:
+			raise NodeBudgetExceeded()
+
+		key = self.get_key(board_state, depth)
+		children = [board_state.make_move(vm.row, vm.column)[1] for vm in board_state.valid_moves]
+
+		while True:
+			phi, delta, best_child, best_child_phi, best_child_delta, second_delta = self.compute_numbers(children, attacker, depth - 1)
+			self.table.store(key, (phi, delta))
+
+			if phi >= phi_threshold or delta >= delta_threshold:
+				return
+
+			child_phi_threshold = min(delta_threshold + best_child_phi - delta, INFINITY)
+			child_delta_threshold = min(phi_threshold, second_delta + 1)
+			self.search(best_child, attacker, depth - 1, child_phi_threshold, child_delta_threshold)
+
+	def compute_numbers(self, children, attacker, child_depth):
+		delta = 0
+		best_child = None
+		best_child_phi = 0
+		best_child_delta = INFINITY
+		second_delta = INFINITY
+
+		for child in children:
+			child_phi, child_delta = self.lookup(child, attacker, child_depth)
+
+			delta = min(delta + child_phi, INFINITY)
+
+			if child_delta < best_child_delta:
+				second_delta = best_child_delta
+				best_child = child
+				best_child_phi = child_phi
+				best_child_delta = child_delta
+			elif child_delta < second_delta:
+				second_delta = child_delta
+
+		phi = best_child_delta
+
+		return phi, delta, best_child, best_child_phi, best_child_delta, second_delta
+
+	def get_winning_line(self, board_state, attacker):
+		line = []
+		depth = self.max_depth
+
+		while not board_state.terminal_node and depth > 0:
+			children = [board_state.make_move(vm.row, vm.column)[1] for vm in board_state.valid_moves]
+
+			if board_state.current_player == attacker:
+				# A winning move: the opponent cannot escape in the child
+				next_states = [child for child in children if self.lookup(child, attacker, depth - 1)[1] == 0]
+			else:
+				# Every reply of the defender loses
+				next_states = [child for child in children if self.lookup(child, attacker, depth - 1)[0] == 0]
+
+			if len(next_states) == 0: # the entries needed are not in the table any more
+				break
+
+			board_state = next_states[0]
+			line.append((board_state.last_move_hex.row, board_state.last_move_hex.column))
+			depth -= 1
+
+		return line
+
+
+def get_opponent(player):
+	return PLAYER_1 if player == PLAYER_2 else PLAYER_2
@@ -0,0 +1,484 @@
+import time
+from func_timeout import func_timeout, FunctionTimedOut
+
+from boardclasses import *
+from evaluationcache import EvaluationCache
+from transpositiontable import TranspositionTable, TranspositionEntry
+from proofnumber import ProofNumberSolver, PROVEN_WIN
+
+
+# Such numbers so as to simplify the debugging process
+MAX_TYPE = 3
+MIN_TYPE = 4
+
+# Root drivers of the iterative deepening: PVS called on each root child, or MTD(f) on the root itself
+PVS_DRIVER = 5
+MTDF_DRIVER = 6
+ROOT_DRIVER = PVS_DRIVER
+
+# Evaluation functions: evaluate_state (lines and enclosure through the last move) or evaluate_patterns (whole board)
+LAST_MOVE_EVALUATOR = 7
+PATTERN_EVALUATOR = 8
+EVALUATOR = LAST_MOVE_EVALUATOR
+
+# The selective search margins below are multiplied by this factor for evaluate_patterns
+PATTERN_MARGIN_SCALE = 10
+
+# Maximum number of evaluated positions kept in memory (least recently used ones are evicted)
+EVALUATION_CACHE_SIZE = 100000
+
+# Maximum number of searched positions kept in memory by the MTD(f) driver
+TRANSPOSITION_TABLE_SIZE = 100000
+
+evaluation_cache = EvaluationCache(EVALUATION_CACHE_SIZE)
+transposition_table = TranspositionTable(TRANSPOSITION_TABLE_SIZE)
+
+# Selective search in pvs, each option can be switched on its own.
+# Margins are expressed in the scale of evaluate_state (longest line through the last move, +5 for an enclosure).
+# evaluate_state only scores the last move, so reductions are by 2 plies: the leaves stay with the same player.
+LATE_MOVE_REDUCTIONS = True
+LMR_FULL_DEPTH_MOVES = 3 # moves searched at full depth before the reductions start
+LMR_MIN_DEPTH = 3
+LMR_REDUCTION = 2
+
+FUTILITY_PRUNING = True
+# Heuristic: at depth 2 (two plies above the leaves) a move is skipped when its own evaluation is low,
+# although its searched score only depends on the replies, so the evaluation does not bound it.
+FUTILITY_MARGIN = 2
+
+RAZORING = True
+RAZORING_MAX_DEPTH = 3
+RAZORING_MARGIN = 4
+RAZORING_REDUCTION = 2
+
+# Moves with at least this evaluate_state value (line of four, enclosure) are never reduced nor pruned
+FORCING_EVALUATION = 4
+
+# Proof-number search for forced wins, tried before the main search when a forcing sequence is likely
+PROOF_NUMBER_SEARCH = True
+PNS_MAX_LEGAL_MOVES = 12
+PNS_MAX_NODES = 300
+PNS_MAX_DEPTH = 5 # plies
+PNS_MIN_TIME = 0.5 # seconds, about the longest solve within PNS_MAX_NODES; skipped when less is left before the hard limit
+PROVEN_WIN_SCORE = 1000
+
+# Value of a position without legal moves (and without a winner), the game ends in a draw
+DRAW_SCORE = 0
+
+# Depth limit of the iterative deepening (depth grows by 2, starting from 1)
+MAX_DEPTH = 20
+
+
+def evaluate(board_state):
+	if EVALUATOR == PATTERN_EVALUATOR:
+		# Updated incrementally with every move, so it is not worth caching
+		return board_state.evaluate_patterns()
+
+	return evaluation_cache.evaluate(board_state)
+
+
+def get_margin(margin):
+	if EVALUATOR == PATTERN_EVALUATOR:
+		return margin * PATTERN_MARGIN_SCALE
+
+	return margin
+
+
+def run_with_time_limit(time_manager, function, args):
+	# Without a time manager the search is only limited by its depth
+	if time_manager is None:
+		return function(*args)
+
+	return func_timeout(time_manager.hard_time_left(), function, args)
+
+
+def perform_iterative_deepening(boardState, time_manager):
+	best_move, __, __ = search_best_move(boardState, time_manager)
+	if best_move is None:
+		return boardState
+
+	__, boardStateHolder = boardState.make_move(best_move[0], best_move[1])
+
+	return boardStateHolder
+
+
+def search_best_move(boardState, time_manager, max_depth=MAX_DEPTH):
+	# Returns the best move (row, column), its score and the depth of the last finished iteration
+	evaluation_cache.reset_statistics()
+
+	valid_moves = boardState.valid_moves
+	if len(valid_moves) == 0: # a draw, there is no move to search
+		return None, DRAW_SCORE, 0
+
+	if time_manager is not None:
+		time_manager.start_move(boardState.game_round, len(valid_moves))
+
+	# Computed once for the root, so that the states made from it only score their last move
+	if EVALUATOR == PATTERN_EVALUATOR:
+		evaluate(boardState)
+
+	proof_result = None
+	if PROOF_NUMBER_SEARCH and should_try_proof(boardState) and \
+	   (time_manager is None or time_manager.hard_time_left() >= PNS_MIN_TIME):
+		try:
+			proof_result = run_with_time_limit(time_manager, ProofNumberSolver(PNS_MAX_NODES, PNS_MAX_DEPTH).solve, (boardState,))
+			print(proof_result)
+		except FunctionTimedOut:
+			print ("Proof-number search: TIME OUT!")
+
+	# A proven win is played at once
+	if proof_result is not None and proof_result.status == PROVEN_WIN and len(proof_result.winning_line) > 0:
+		best_move, best_move_score, finished_depth = proof_result.winning_line[0], PROVEN_WIN_SCORE, len(proof_result.winning_line)
+	elif ROOT_DRIVER == MTDF_DRIVER:
+		best_move, best_move_score, finished_depth = search_best_move_mtdf(boardState, valid_moves, time_manager, max_depth)
+	else:
+		best_move, best_move_score, finished_depth = search_best_move_pvs(boardState, valid_moves, time_manager, max_depth)
+
+	print(evaluation_cache)
+
+	if time_manager is not None:
+		time_manager.end_move()
+		print(time_manager)
+
+	return best_move, best_move_score, finished_depth
+
+
+def should_try_proof(boardState):
+	# The opening moves are never forced
+	if boardState.game_round <= 2:
+		return False
+
+	# Few legal moves, a threat of the opponent, or a threat we can make suggest a forcing sequence
+	if len(boardState.valid_moves) <= PNS_MAX_LEGAL_MOVES or is_forcing(boardState):
+		return True
+
+	return any(is_forcing(boardState.make_move(vm.row, vm.column)[1]) for vm in boardState.valid_moves)
+
+
+def search_best_move_pvs(boardState, valid_moves, time_manager, max_depth):
+	time_out = False
+	depth = 1
+
+	infinity = float('inf')
+	minus_infinity = float('-inf')
+
+	potential_states = [boardState.make_move(vm.row, vm.column)[1] for vm in valid_moves]
+	potential_states.sort(key=lambda state: evaluate(state))
+	potential_states.reverse()
+
+	# Played if not even the first iteration can be finished in time
+	best_move = (potential_states[0].last_move_hex.row, potential_states[0].last_move_hex.column)
+	best_move_score = evaluate(potential_states[0])
+	finished_depth = 0
+
+	while time_manager is None or time_manager.can_start_iteration():
+		# The first move is kept if every move scores -inf
+		best_score = float('-inf')
+		best_next_state = potential_states[0]
+
+		time_passed = 0
+		iteration_start_time = time.time()
+
+		for potential_state in potential_states:
+			try:
+				start_time=time.time()
+				#score = run_with_time_limit(time_manager, alpha_beta, (potential_state, depth, minus_infinity, infinity, MAX_TYPE))
+				score = -run_with_time_limit(time_manager, pvs, (potential_state, depth, minus_infinity, infinity))
+				end_time=time.time()
+				current_time_passed = end_time - start_time
+			except FunctionTimedOut:
+				print ("TIME OUT!")
+				time_out = True
+				break			
+
+			if score > best_score:
+				best_score = score
+				best_next_state = potential_state
+
+			time_passed = max(current_time_passed, time_passed)
+
+		if time_out:
+			break
+
+		print("Max time for depth {}: {}s".format(depth, time_passed))
+
+		best_move = (best_next_state.last_move_hex.row, best_next_state.last_move_hex.column)
+		best_move_score = best_score
+		finished_depth = depth
+
+		if time_manager is not None:
+			time_manager.report_iteration(time.time() - iteration_start_time, best_move)
+
+		depth += 2
+		if depth > max_depth:
+			break
+
+	return best_move, best_move_score, finished_depth
+
+
+def search_best_move_mtdf(boardState, valid_moves, time_manager, max_depth):
+	depth = 1
+
+	# MTD(f) converges faster when seeded with the value of the previous iteration
+	first_guess = 0
+
+	# Played if not even the first iteration can be finished in time
+	fallback_state = max([boardState.make_move(vm.row, vm.column)[1] for vm in valid_moves], key=lambda state: evaluate(state))
+	best_move = (fallback_state.last_move_hex.row, fallback_state.last_move_hex.column)
+	best_move_score = evaluate(fallback_state)
+	finished_depth = 0
+
+	while time_manager is None or time_manager.can_start_iteration():
+		try:
+			start_time=time.time()
+			# depth + 1, since the PVS driver searches the root children (one ply below the root) with the given depth
+			score, best_move = run_with_time_limit(time_manager, mtdf, (boardState, first_guess, depth + 1))
+			end_time=time.time()
+			current_time_passed = end_time - start_time
+		except FunctionTimedOut:
+			print ("TIME OUT!")
+			break
+
+		first_guess = score
+		best_move_score = score
+		finished_depth = depth
+
+		print("Time for depth {}: {}s (MTD(f) value: {})".format(depth, current_time_passed, score))
+
+		if time_manager is not None:
+			time_manager.report_iteration(current_time_passed, best_move)
+
+		depth += 2
+		if depth > max_depth:
+			break
+
+	return best_move, best_move_score, finished_depth
+
+
+def mtdf(board_state, first_guess, depth):
+	score = first_guess
+	best_move = None
+
+	lower_bound = float('-inf')
+	upper_bound = float('inf')
+
+	while lower_bound < upper_bound:
+		beta = max(score, lower_bound + 1)
+		score = alpha_beta_with_memory(board_state, depth, beta - 1, beta)
+
+		if score < beta:
+			upper_bound = score
+		else:
+			lower_bound = score
+			# The best move is only reliable after a fail high (the last search always fails high)
+			best_move = transposition_table.lookup(board_state.get_evaluation_key()).best_move
+
+	return score, best_move
+
+
+def alpha_beta_with_memory(board_state, depth, alpha, beta):
+	key = board_state.get_evaluation_key()
+	entry = transposition_table.lookup(key)
+
+	if entry is not None and entry.depth >= depth:
+		if entry.lower_bound >= beta:
+			return entry.lower_bound
+		if entry.upper_bound <= alpha:
+			return entry.upper_bound
+		alpha = max(alpha, entry.lower_bound)
+		beta = min(beta, entry.upper_bound)
+
+	if (depth == 0 or board_state.terminal_node):
+		return -evaluate(board_state)
+
+	valid_moves = board_state.valid_moves
+	if len(valid_moves) == 0:
+		return DRAW_SCORE
+
+	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
+	children.sort(key=lambda state: evaluate(state))
+	children.reverse()
+
+	# Search the best move remembered from the previous searches first
+	if entry is not None and entry.best_move is not None:
+		children.sort(key=lambda state: (state.last_move_hex.row, state.last_move_hex.column) != entry.best_move)
+
+	score = float('-inf')
+	best_move = None
+	current_alpha = alpha
+
+	for child in children:
+		value = -alpha_beta_with_memory(child, depth - 1, -beta, -current_alpha)
+
+		if value > score:
+			score = value
+			best_move = (child.last_move_hex.row, child.last_move_hex.column)
+
+		current_alpha = max(current_alpha, score)
+		if score >= beta:
+			break
+
+	# Keep the bound from the other side if the entry was searched to the same depth
+	lower_bound = float('-inf')
+	upper_bound = float('inf')
+	if entry is not None and entry.depth == depth:
+		lower_bound = entry.lower_bound
+		upper_bound = entry.upper_bound
+
+	if score <= alpha:
+		upper_bound = score
+	elif score >= beta:
+		lower_bound = score
+	else:
+		lower_bound = score
+		upper_bound = score
+
+	transposition_table.store(key, TranspositionEntry(depth, lower_bound, upper_bound, best_move))
+
+	return score
+
+
+def is_forcing(board_state):
+	# The last move won or threatens to win (a line of at least four or an enclosure).
+	# A winning move always evaluates to at least 5, so the win check (terminal_node) is not needed.
+	return evaluation_cache.evaluate(board_state) >= FORCING_EVALUATION
+
+
+def pvs(board_state, depth, alpha, beta):
+	# Leaves are only evaluated, without generating their moves or checking for a win
+	if (depth == 0 or board_state.terminal_node):
+		return -evaluate(board_state)
+
+	# If the opponent's last move is a threat, no reply is reduced or pruned
+	forcing_position = is_forcing(board_state)
+
+	if RAZORING and not forcing_position and 1 < depth <= RAZORING_MAX_DEPTH and \
+	   -evaluate(board_state) + get_margin(RAZORING_MARGIN) <= alpha:
+		depth -= RAZORING_REDUCTION
+		if depth <= 0:
+			return -evaluate(board_state)
+
+	valid_moves = board_state.valid_moves
+	if len(valid_moves) == 0:
+		return DRAW_SCORE
+
+	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
+	children.sort(key=lambda state: evaluate(state))
+	children.reverse()
+
+	for i in range(0, len(children)):
+		if i == 0:
+			score = -pvs(children[i], depth - 1, -beta, -alpha)
+		else:
+			forcing_move = forcing_position or is_forcing(children[i])
+
+			# Quiet moves which do not build anything are assumed not to raise alpha (not a bound, see FUTILITY_MARGIN)
+			if FUTILITY_PRUNING and not forcing_move and depth == 2 and \
+			   evaluate(children[i]) + get_margin(FUTILITY_MARGIN) <= alpha:
+				continue
+
+			reduced = LATE_MOVE_REDUCTIONS and not forcing_move and \
+					  i >= LMR_FULL_DEPTH_MOVES and depth >= LMR_MIN_DEPTH
+			if reduced:
+				score = -pvs(children[i], depth - 1 - LMR_REDUCTION, -alpha - 1, -alpha)
+
+			# Null-window search at full depth (for reduced moves only when they failed high)
+			if not reduced or score > alpha:
+				score = -pvs(children[i], depth - 1, -alpha - 1, -alpha)
+				if (alpha < score and score < beta):
+					score = -pvs(children[i], depth - 1, -beta, -score)
+
+		alpha = max(alpha, score)
+		if alpha >= beta:
+			break
+
+	return alpha
+
+
+def alpha_beta_negamax(board_state, depth, alpha, beta):
+	if (depth == 0 or board_state.terminal_node):
+		return -evaluate(board_state)
+
+	valid_moves = board_state.valid_moves
+	if len(valid_moves) == 0:
+		return DRAW_SCORE
+
+	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
+
+	children.sort(key=lambda state: evaluate(state))
+	children.reverse()
+
+	score = float('-inf')
+
+	for child in children:
+		value = -alpha_beta_negamax(child, depth - 1, -beta, -alpha)
+
+		if value > score:
+			score = value
+
+		if score > alpha:
+			alpha = score
+
+		if score >= beta:
+			break
+
+	return score
+
+
+def alpha_beta(board_state, depth, alpha, beta, player_type):
+	if (depth == 0 or board_state.terminal_node):
+		return evaluate(board_state)
+
+	valid_moves = board_state.valid_moves
+	if len(valid_moves) == 0:
+		return DRAW_SCORE
+
+	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
+
+
+	children.sort(key=lambda state: evaluate(state))
+
+	if player_type == MAX_TYPE:
+		children.reverse()
+		score = float('-inf')
+		for child in children:
+			value = alpha_beta(child, depth - 1, alpha, beta, MIN_TYPE)
+			score = max(score, value)
+			alpha = max(alpha, score)
+			if alpha >= beta:
+				break # beta cut-off
+		return score
+	else: # MIN player
+		score = float('inf')
+		for child in children:
+			value = alpha_beta(child, depth - 1, alpha, beta, MAX_TYPE)
+			score = min(score, value)
+			beta = min(beta, score)
+			if alpha >= beta:
+				break # alpha cut-off
+		return score
+
+
+
+def minimax(board_state, depth, player_type):
+	if (depth == 0 or board_state.terminal_node):
+		return evaluate(board_state)
+
+	valid_moves = board_state.valid_moves
+	if len(valid_moves) == 0:
+		return DRAW_SCORE
+
+	children = [board_state.make_move(vm.row, vm.column)[1] for vm in valid_moves]
+
+	if player_type == MAX_TYPE:
+		score = float('-inf')
+		for child in children:
+			value = minimax(child, depth - 1, MIN_TYPE)
+			score = max(score, value)
+	else:
+		score = float('inf')
+		for child in children:
+			value = minimax(child, depth - 1, MAX_TYPE)
+			score = min(score, value)
+
+	return score
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from boardclasses import *
+from search import search_best_move
+from timemanager import TimeManager
+from analyze import init_worker
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+
+# Game clock of the AI in every session (seconds), with the increment added after each of its moves
+DEFAULT_GAME_TIME = 5 * 60
+DEFAULT_TIME_INCREMENT = 2
+
+# Latencies of the last AI moves kept for the percentiles, and how often (seconds) they are printed
+LATENCY_HISTORY = 1000
+STATS_INTERVAL = 30
+
+HELP_TEXT = "commands: NEW [side] [human|ai], MOVE <move> (e.g. MOVE 10 J), STATE, STATS, QUIT"
+
+
+class EngineError(Exception):
+	pass
+
+
+def engine_move(side, moves, time_manager):
+	# Runs in a worker process: the position is rebuilt from the moves (row, column)
+	boardState = BoardState([], [], None, 1, PLAYER_1, geometry=get_board_geometry(side))
+	for row, column in moves:
+		__, boardState = boardState.make_move(row, column)
+
+	best_move, __, __ = search_best_move(boardState, time_manager)
+
+	# The time manager comes back with the clock charged for the search
+	return best_move, time_manager
+
+
+def percentile(sorted_values, fraction):
+	index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+	return sorted_values[index]
+
+
+class EngineScheduler:
+	# Bounded pool of engine processes, served round-robin between the sessions with pending requests
+	def __init__(self, workers):
+		self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+		self.free_workers = asyncio.Semaphore(workers)
+
+		self.pending = OrderedDict() # session id -> deque of (arguments, future), in round-robin order
+		self.new_request = asyncio.Event()
+
+		self.latencies = deque(maxlen=LATENCY_HISTORY)
+		self.completed_count = 0
+
+	async def request_move(self, session_id, side, moves, time_manager):
+		future = asyncio.get_running_loop().create_future()
+		self.pending.setdefault(session_id, deque()).append(((side, moves, time_manager), future))
+		self.new_request.set()
+
+		start_time = time.time()
+		result = await future
+		self.latencies.append(time.time() - start_time)
+		self.completed_count += 1
+
+		return result
+
+	def next_request(self):
+		# The session served now goes to the end of the rotation
+		session_id, requests = next(iter(self.pending.items()))
+		request = requests.popleft()
+
+		del self.pending[session_id]
+		if len(requests) > 0:
+			self.pending[session_id] = requests
+
+		return request
+
+	async def dispatch(self):
+		loop = asyncio.get_running_loop()
+
+		while True:
+			await self.free_workers.acquire()
+
+			while len(self.pending) == 0:
+				self.new_request.clear()
+				await self.new_request.wait()
+
+			arguments, future = self.next_request()
+			task = loop.run_in_executor(self.executor, engine_move, *arguments)
+			task.add_done_callback(lambda task, future=future: self.finish_request(task, future))
+
+	def finish_request(self, task, future):
+		self.free_workers.release()
+
+		if future.cancelled():
+			return
+		if task.exception() is not None:
+			future.set_exception(task.exception())
+		else:
+			future.set_result(task.result())
+
+	def get_statistics(self):
+		latencies = sorted(self.latencies)
+		if len(latencies) == 0:
+			return {"moves": self.completed_count}
+
+		return {
+			"moves": self.completed_count,
+			"queued": sum(len(requests) for requests in self.pending.values()),
+			"p50": round(percentile(latencies, 0.5), 3),
+			"p90": round(percentile(latencies, 0.9), 3),
+			"p99": round(percentile(latencies, 0.99), 3),
+			"max": round(latencies[-1], 3),
+		}
+
+	def shutdown(self):
+		self.executor.shutdown(cancel_futures=True)
+
+
+class GameSession:
+	def __init__(self, session_id, scheduler, game_time, time_increment):
+		self.session_id = session_id
+		self.scheduler = scheduler
+		self.game_time = game_time
+		self.time_increment = time_increment
+
+		self.boardState = None
+
+	def new_game(self, side, ai_player):
+		self.geometry = get_board_geometry(side)
+		self.boardState = BoardState([], [], None, 1, PLAYER_1, geometry=self.geometry)
+		self.moves = []
+		self.ai_player = ai_player
+		self.time_manager = TimeManager(self.game_time, self.time_increment)
+
+	def to_havannah(self, row, column):
+		return self.geometry.my_notation_to_havannah_dict[str(row) + ' ' + str(column)]
+
+	def get_winner(self):
+		if not self.boardState.terminal_node:
+			return None
+
+		# current player of the state, so the last move (which caused the winning state) belongs to the opposite player
+		return PLAYER_2 if self.boardState.current_player == PLAYER_1 else PLAYER_1
+
+	def is_draw(self):
+		# Nobody won and there is no legal move left (happens on small boards)
+		return not self.boardState.terminal_node and len(self.boardState.valid_moves) == 0
+
+	def is_finished(self):
+		return self.get_winner() is not None or self.is_draw()
+
+	def play(self, row, column):
+		# make_move prints the reason of an invalid move
+		reason = io.StringIO()
+		with contextlib.redirect_stdout(reason):
+			was_move_made, boardStateHolder = self.boardState.make_move(row, column)
+
+		if not was_move_made:
+			raise ValueError(reason.getvalue().strip())
+
+		self.boardState = boardStateHolder
+		self.moves.append((row, column))
+
+	async def play_ai_move(self):
+		try:
+			best_move, self.time_manager = await self.scheduler.request_move(self.session_id, self.geometry.side, list(self.moves), self.time_manager)
+		except Exception as error:
+			# Reported to the client, the session goes on (e.g. with a new game)
+			raise EngineError("engine failure: {}: {}".format(type(error).__name__, error))
+		if best_move is None:
+			raise EngineError("engine failure: no move found")
+
+		self.play(best_move[0], best_move[1])
+
+		return self.to_havannah(best_move[0], best_move[1])
+
+	async def handle_command(self, line):
+		words = line.split()
+		if len(words) == 0:
+			raise ValueError("empty command")
+		command = words[0].upper()
+
+		if command == "NEW":
+			side = int(words[1]) if len(words) > 1 else DEFAULT_BOARD_SIDE
+			first = words[2].lower() if len(words) > 2 else "human"
+			if side < MIN_BOARD_SIDE or side > MAX_BOARD_SIDE or first not in ("human", "ai"):
+				raise ValueError("usage: NEW [side] [human|ai]")
+
+			self.new_game(side, PLAYER_1 if first == "ai" else PLAYER_2)
+			response = {"side": side, "ai_player": self.ai_player}
+			if self.ai_player == PLAYER_1:
+				response["ai_move"] = await self.play_ai_move()
+			return response
+
+		if command == "MOVE":
+			if self.boardState is None:
+				raise ValueError("no game, use NEW first")
+			if self.is_finished():
+				raise ValueError("the game is finished")
+			if self.boardState.current_player == self.ai_player:
+				raise ValueError("not your turn")
+
+			try:
+				converted_string = self.geometry.havannah_to_my_notation_dict[" ".join(words[1:]).upper()]
+			except KeyError:
+				raise ValueError("incorrect move, use Havannah notation (e.g. '10 J')")
+			(input_row_string, input_column_string) = converted_string.split(" ")
+			self.play(int(input_row_string), int(input_column_string))
+
+			response = {}
+			if not self.is_finished():
+				response["ai_move"] = await self.play_ai_move()
+			if self.get_winner() is not None:
+				response["winner"] = "ai" if self.get_winner() == self.ai_player else "human"
+			elif self.is_draw():
+				response["draw"] = True
+			return response
+
+		if command == "STATE":
+			if self.boardState is None:
+				raise ValueError("no game, use NEW first")
+
+			return {
+				"side": self.geometry.side,
+				"round": self.boardState.game_round,
+				"to_move": self.boardState.current_player,
+				"ai_player": self.ai_player,
+				"moves": [self.to_havannah(row, column) for row, column in self.moves],
+				"valid_moves": [self.to_havannah(hex.row, hex.column) for hex in self.boardState.valid_moves],
+				"winner": self.get_winner(),
+				"draw": self.is_draw(),
+				"ai_clock": round(self.time_manager.remaining_time, 2),
+			}
+
+		if command == "STATS":
+			return self.scheduler.get_statistics()
+
+		raise ValueError("unknown command, " + HELP_TEXT)
+
+
+class GameServer:
+	def __init__(self, workers, game_time, time_increment):
+		self.workers = workers
+		self.game_time = game_time
+		self.time_increment = time_increment
+		self.session_counter = 0
+
+	async def handle_connection(self, reader, writer):
+		self.session_counter += 1
+		session = GameSession(self.session_counter, self.scheduler, self.game_time, self.time_increment)
+		print("Session {} opened".format(session.session_id))
+
+		try:
+			while True:
+				line = await reader.readline()
+				if not line or line.strip().upper() == b"QUIT":
+					break
+
+				try:
+					response = "OK " + json.dumps(await session.handle_command(line.decode().strip()))
+				except (ValueError, UnicodeDecodeError, EngineError) as error:
+					response = "ERROR {}".format(error)
+
+				writer.write((response + "\n").encode())
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			print("Session {} closed".format(session.session_id))
+			writer.close()
+
+	async def report_statistics(self):
+		reported_count = 0
+		while True:
+			await asyncio.sleep(STATS_INTERVAL)
+			if self.scheduler.completed_count != reported_count:
+				reported_count = self.scheduler.completed_count
+				print("AI move latency (s): {}".format(self.scheduler.get_statistics()))
+
+	async def serve(self, host, port):
+		self.scheduler = EngineScheduler(self.workers)
+		server = await asyncio.start_server(self.handle_connection, host, port)
+		print("Listening on {}:{} with {} engine workers ({})".format(host, port, self.workers, HELP_TEXT))
+
+		background_tasks = [asyncio.create_task(self.scheduler.dispatch()), asyncio.create_task(self.report_statistics())]
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			for task in background_tasks:
+				task.cancel()
+			self.scheduler.shutdown()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Andantino game server: many human vs AI games over a line protocol")
+	parser.add_argument("--host", default=DEFAULT_HOST)
+	parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+	parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="number of engine processes")
+	parser.add_argument("--game-time", type=float, default=DEFAULT_GAME_TIME, help="AI clock per game (seconds)")
+	parser.add_argument("--increment", type=float, default=DEFAULT_TIME_INCREMENT, help="added to the AI clock after each of its moves (seconds)")
+	args = parser.parse_args()
+
+	try:
+		asyncio.run(GameServer(args.workers, args.game_time, args.increment).serve(args.host, args.port))
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == "__main__":
+	main()
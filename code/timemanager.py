@@ -0,0 +1,98 @@
+import time
+
+
+# Rough number of rounds (moves of both players) in a game, used to spread the clock over the remaining moves
+EXPECTED_GAME_ROUNDS = 80
+MIN_MOVES_TO_GO = 10
+
+# Number of legal moves considered "typical"; wider positions get more time, narrower ones less
+TYPICAL_MOVE_COUNT = 30
+MIN_WIDTH_FACTOR = 0.5
+MAX_WIDTH_FACTOR = 1.5
+
+# The soft limit is extended by this factor each time the best move changes between iterations
+INSTABILITY_FACTOR = 1.5
+
+# The hard limit is a multiple of the soft limit, but never more than this fraction of the remaining clock
+HARD_LIMIT_FACTOR = 4
+MAX_CLOCK_FRACTION = 0.3
+
+# Kept aside for the overhead outside the search (making the move, drawing, ...)
+SAFETY_MARGIN = 0.1
+
+# Assumed growth of the iteration time (depth grows by 2), until two iterations have been measured
+DEFAULT_GROWTH_FACTOR = 8
+
+
+class TimeManager:
+	def __init__(self, total_time, increment, move_time=None):
+		self.remaining_time = total_time
+		self.increment = increment
+		self.move_time = move_time # fixed budget of every move (e.g. for analysis), instead of the clock allocation
+
+		self.move_start_time = None
+		self.soft_limit = 0
+		self.hard_limit = 0
+
+		self.iteration_times = []
+		self.best_move = None
+
+	def start_move(self, game_round, legal_move_count):
+		self.move_start_time = time.time()
+		self.iteration_times = []
+		self.best_move = None
+
+		usable_time = max(self.remaining_time - SAFETY_MARGIN, 0)
+
+		# Our own moves left, assuming the game lasts EXPECTED_GAME_ROUNDS rounds
+		moves_to_go = max(MIN_MOVES_TO_GO, (EXPECTED_GAME_ROUNDS - game_round) // 2)
+		width_factor = min(max(legal_move_count / TYPICAL_MOVE_COUNT, MIN_WIDTH_FACTOR), MAX_WIDTH_FACTOR)
+
+		self.hard_limit = min(usable_time * MAX_CLOCK_FRACTION + self.increment, usable_time)
+		self.soft_limit = min((usable_time / moves_to_go + self.increment) * width_factor, self.hard_limit)
+		self.hard_limit = min(self.soft_limit * HARD_LIMIT_FACTOR, self.hard_limit)
+
+		if self.move_time is not None:
+			self.soft_limit = self.move_time
+			self.hard_limit = self.move_time
+
+		# A single legal move does not need any search
+		if legal_move_count <= 1:
+			self.soft_limit = 0
+
+	def end_move(self):
+		self.remaining_time += self.increment - self.elapsed()
+		self.move_start_time = None
+
+	def elapsed(self):
+		return time.time() - self.move_start_time
+
+	def hard_time_left(self):
+		return max(self.hard_limit - self.elapsed(), 0)
+
+	def report_iteration(self, iteration_time, best_move):
+		self.iteration_times.append(iteration_time)
+
+		# PV instability: a different best move than in the previous iteration deserves more time
+		if self.best_move is not None and best_move != self.best_move:
+			self.soft_limit = min(self.soft_limit * INSTABILITY_FACTOR, self.hard_limit)
+
+		self.best_move = best_move
+
+	def can_start_iteration(self):
+		if len(self.iteration_times) == 0:
+			return self.soft_limit > 0
+
+		if len(self.iteration_times) >= 2 and self.iteration_times[-2] > 0:
+			growth_factor = self.iteration_times[-1] / self.iteration_times[-2]
+		else:
+			growth_factor = DEFAULT_GROWTH_FACTOR
+
+		predicted_time = self.iteration_times[-1] * growth_factor
+		elapsed = self.elapsed()
+
+		# Starting an iteration which cannot finish before the hard limit only wastes the clock
+		return elapsed < self.soft_limit and elapsed + predicted_time < self.hard_limit
+
+	def __str__(self):
+		return "Clock: {:.1f}s left (soft limit {:.2f}s, hard limit {:.2f}s)".format(self.remaining_time, self.soft_limit, self.hard_limit)
@@ -0,0 +1,32 @@
+from collections import OrderedDict
+
+
+class TranspositionEntry:
+	def __init__(self, depth, lower_bound, upper_bound, best_move):
+		self.depth = depth
+		self.lower_bound = lower_bound
+		self.upper_bound = upper_bound
+		self.best_move = best_move # (row, column) of the best child found so far, used for move ordering
+
+
+class TranspositionTable:
+	def __init__(self, max_entries):
+		self.max_entries = max_entries
+		self.entries = OrderedDict() # position key -> TranspositionEntry, least recently used first
+
+	def lookup(self, key):
+		entry = self.entries.get(key)
+		if entry is not None:
+			self.entries.move_to_end(key)
+
+		return entry
+
+	def store(self, key, entry):
+		self.entries[key] = entry
+		self.entries.move_to_end(key)
+
+		if len(self.entries) > self.max_entries:
+			self.entries.popitem(last=False) # evict the least recently used entry
+
+	def clear(self):
+		self.entries.clear()